@@ -0,0 +1,34 @@
+"""
+Utilitários de tempo para caminhos quentes (health checks, logs)
+"""
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+
+
+@lru_cache(maxsize=1)
+def _format_iso(epoch_seconds: int) -> str:
+    """Formata um epoch (em segundos) como ISO 8601 UTC"""
+    return datetime.fromtimestamp(epoch_seconds, tz=timezone.utc).strftime(
+        "%Y-%m-%dT%H:%M:%SZ"
+    )
+
+
+def iso_now() -> str:
+    """Timestamp ISO 8601 UTC com resolução de 1 segundo (formatado uma vez por segundo)"""
+    return _format_iso(int(time.time()))
+
+
+@lru_cache(maxsize=1)
+def _datetime_from_ms(epoch_ms: int) -> datetime:
+    """Converte um epoch (em milissegundos) para datetime local"""
+    return datetime.fromtimestamp(epoch_ms / 1000)
+
+
+def cached_now() -> datetime:
+    """
+    Equivalente a datetime.now() com resolução de 1 milissegundo
+    
+    Chamadas dentro do mesmo milissegundo reaproveitam o mesmo objeto (datetime é imutável).
+    """
+    return _datetime_from_ms(time.time_ns() // 1_000_000)
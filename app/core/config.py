@@ -1,3 +1,4 @@
+from functools import cached_property
 from pydantic_settings import BaseSettings
 from pydantic import Field
 from typing import Optional
@@ -33,9 +34,14 @@ class Settings(BaseSettings):
     # External APIs
     GEMINI_API_KEY: Optional[str] = Field(default=None, env="GEMINI_API_KEY")
     CLASSIFICATION_SERVICE_URL: Optional[str] = Field(default=None, env="CLASSIFICATION_SERVICE_URL")
+    BATCH_LLM_CONCURRENCY: int = Field(default=8, ge=1, env="BATCH_LLM_CONCURRENCY")
+    BATCH_CLASSIFICATION_CONCURRENCY: int = Field(
+        default=32, ge=1, env="BATCH_CLASSIFICATION_CONCURRENCY"
+    )
     
     # Logging
     LOG_LEVEL: str = Field(default="INFO", env="LOG_LEVEL")
+    LOG_BUFFER_CAPACITY: int = Field(default=1024, env="LOG_BUFFER_CAPACITY")
     
     # Optional environment variables that may exist
     ENVIRONMENT: Optional[str] = Field(default="development", env="ENVIRONMENT")
@@ -45,19 +51,26 @@ class Settings(BaseSettings):
     AWS_SECRET_ACCESS_KEY: Optional[str] = Field(default=None, env="AWS_SECRET_ACCESS_KEY")
     HEALTH_CHECK_TIMEOUT: Optional[str] = Field(default="30", env="HEALTH_CHECK_TIMEOUT")
     
-    @property
-    def cors_origins(self) -> list[str]:
-        """Retorna lista de origens CORS permitidas"""
+    @cached_property
+    def cors_origins(self) -> tuple[str, ...]:
+        """Retorna as origens CORS permitidas (calculadas uma única vez)"""
         if self.ALLOWED_ORIGINS == "*":
-            return ["*"]
-        return [origin.strip() for origin in self.ALLOWED_ORIGINS.split(",")]
+            return ("*",)
+        return tuple(origin.strip() for origin in self.ALLOWED_ORIGINS.split(","))
+    
+    @cached_property
+    def cors_origin_set(self) -> frozenset[str]:
+        """Origens CORS permitidas para verificação de pertinência em O(1)"""
+        return frozenset(self.cors_origins)
     
     model_config = {
         "env_file": ".env",
         "env_file_encoding": "utf-8",
         "case_sensitive": True,
         "use_enum_values": True,
-        "extra": "ignore"  # Ignora campos extras
+        "extra": "ignore",  # Ignora campos extras
+        "frozen": True,  # Configurações imutáveis após o carregamento
+        "validate_assignment": False
     }
 
 # Instância global das configurações
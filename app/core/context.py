@@ -0,0 +1,10 @@
+"""
+Contexto por requisição (ContextVars)
+"""
+from contextvars import ContextVar
+
+# ID da requisição atual, definido pelo middleware de logging.
+# Cada requisição roda em sua própria task, com cópia própria do contexto, então o
+# valor não vaza entre requisições e não é resetado: os handlers de erro 500 rodam
+# depois que o middleware já retornou e ainda precisam lê-lo.
+request_id_var: ContextVar[str] = ContextVar("request_id", default="")
@@ -3,22 +3,54 @@ Sistema de logging simplificado para MVP
 """
 import logging
 import sys
+from functools import lru_cache
+from logging.handlers import MemoryHandler
 
 
-def setup_logging(log_level: str = "INFO") -> None:
-    """Configura o sistema de logging simples"""
+# Formatter compartilhado, criado uma única vez
+_FORMATTER = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+
+def setup_logging(log_level: str = "INFO", buffer_capacity: int = 0) -> None:
+    """
+    Configura o sistema de logging simples (idempotente)
+    
+    Com `buffer_capacity > 0`, os registros são acumulados em um MemoryHandler e
+    escritos em lote no stdout (imediatamente para ERROR ou acima). O buffer também
+    é descarregado periodicamente via `flush_logging()` pelo sampler de métricas.
+    """
     
     # Configurar nível de log
     log_level_enum = getattr(logging, log_level.upper(), logging.INFO)
     
-    # Configurar logging básico
-    logging.basicConfig(
-        level=log_level_enum,
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        handlers=[logging.StreamHandler(sys.stdout)]
-    )
+    root = logging.getLogger()
+    
+    # Remover handlers existentes para evitar logs duplicados em reloads/testes
+    for handler in list(root.handlers):
+        handler.flush()
+        root.removeHandler(handler)
+    
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(_FORMATTER)
+    
+    if buffer_capacity > 0:
+        handler = MemoryHandler(
+            capacity=buffer_capacity,
+            flushLevel=logging.ERROR,
+            target=handler
+        )
+    
+    root.addHandler(handler)
+    root.setLevel(log_level_enum)
+
+
+def flush_logging() -> None:
+    """Descarrega registros pendentes em buffer (periodicamente e no shutdown da aplicação)"""
+    for handler in logging.getLogger().handlers:
+        handler.flush()
 
 
+@lru_cache(maxsize=None)
 def get_logger(name: str) -> logging.Logger:
-    """Obtém um logger configurado"""
-    return logging.getLogger(name)
\ No newline at end of file
+    """Obtém um logger configurado (memoizado por nome)"""
+    return logging.getLogger(name)
@@ -1,7 +1,8 @@
-from pydantic import BaseModel, Field, field_validator, model_validator
-from typing import Optional, Dict, Any
+from pydantic import BaseModel, Field, model_validator
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 from enum import Enum
+from functools import cached_property
 import uuid
 
 
@@ -13,6 +14,14 @@ class RiskLevel(str, Enum):
     CRITICAL = "critical"
 
 
+# Bits de PatientData.risk_mask (um bit por indicador de risco)
+RISK_HIGH_GLUCOSE = 1 << 0
+RISK_HYPERTENSION = 1 << 1
+RISK_SEVERE_HYPERTENSION = 1 << 2
+RISK_ELDERLY = 1 << 3
+RISK_FAMILY_HISTORY = 1 << 4
+
+
 class PatientDataInput(BaseModel):
     """DTO para entrada de dados do paciente"""
     idade: int = Field(
@@ -24,7 +33,7 @@ class PatientDataInput(BaseModel):
     nivel_glicose: float = Field(
         ..., 
         ge=0, 
-        le=1000, 
+        le=800,  # Acima disso é valor extremamente alto, provavelmente erro
         description="Nível de glicose em mg/dL"
     )
     pressao_sistolica: int = Field(
@@ -44,14 +53,20 @@ class PatientDataInput(BaseModel):
         description="Se possui histórico familiar de diabetes/hipertensão"
     )
     
-    @field_validator('nivel_glicose')
-    @classmethod
-    def validate_glucose_level(cls, v):
-        if v < 0:
-            raise ValueError('Nível de glicose não pode ser negativo')
-        if v > 800:  # Valor extremamente alto, provavelmente erro
-            raise ValueError('Nível de glicose muito alto, verificar dados')
-        return v
+    @cached_property
+    def blood_pressure_formatted(self) -> str:
+        return f"{self.pressao_sistolica}/{self.pressao_diastolica}"
+    
+    def to_ml_dict(self) -> Dict[str, Any]:
+        """Dados clínicos no formato esperado pelos serviços de classificação e LLM"""
+        # Leitura direta dos atributos: o esquema é fixo, dispensa o model_dump()
+        return {
+            "idade": self.idade,
+            "nivel_glicose": self.nivel_glicose,
+            "pressao_sistolica": self.pressao_sistolica,
+            "pressao_diastolica": self.pressao_diastolica,
+            "historico_familiar": self.historico_familiar
+        }
     
     @model_validator(mode='after')
     def validate_blood_pressure(self):
@@ -76,27 +91,55 @@ class PatientDataInput(BaseModel):
 
 class PatientData(PatientDataInput):
     """Entidade de domínio do paciente (para uso interno)"""
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
     created_at: datetime = Field(default_factory=datetime.now)
     
-    @property
-    def blood_pressure_formatted(self) -> str:
-        return f"{self.pressao_sistolica}/{self.pressao_diastolica}"
+    @classmethod
+    def from_validated_input(cls, patient_input: PatientDataInput) -> "PatientData":
+        """
+        Cria a entidade a partir de um input já validado, sem revalidar.
+        
+        O chamador garante que `patient_input` passou pela validação do
+        PatientDataInput (ex.: corpo da requisição validado pelo FastAPI).
+        """
+        values = patient_input.__dict__
+        return cls.model_construct(
+            **{name: values[name] for name in PatientDataInput.model_fields}
+        )
     
-    @property
+    @cached_property
+    def risk_mask(self) -> int:
+        """Indicadores de risco empacotados em bits (ver constantes RISK_*)"""
+        mask = 0
+        if self.nivel_glicose > 200:
+            mask |= RISK_HIGH_GLUCOSE
+        if self.pressao_sistolica > 140 or self.pressao_diastolica > 90:
+            mask |= RISK_HYPERTENSION
+        if self.pressao_sistolica > 160 or self.pressao_diastolica > 100:
+            mask |= RISK_SEVERE_HYPERTENSION
+        if self.idade > 65:
+            mask |= RISK_ELDERLY
+        if self.historico_familiar:
+            mask |= RISK_FAMILY_HISTORY
+        return mask
+    
+    @cached_property
     def risk_indicators(self) -> Dict[str, bool]:
-        """Indicadores de risco baseados nos dados"""
+        """Indicadores de risco baseados nos dados (calculados uma vez por paciente)"""
+        mask = self.risk_mask
         return {
-            "high_glucose": self.nivel_glicose > 200,
-            "hypertension": self.pressao_sistolica > 140 or self.pressao_diastolica > 90,
-            "severe_hypertension": self.pressao_sistolica > 160 or self.pressao_diastolica > 100,
-            "elderly": self.idade > 65,
-            "family_history": self.historico_familiar
+            "high_glucose": bool(mask & RISK_HIGH_GLUCOSE),
+            "hypertension": bool(mask & RISK_HYPERTENSION),
+            "severe_hypertension": bool(mask & RISK_SEVERE_HYPERTENSION),
+            "elderly": bool(mask & RISK_ELDERLY),
+            "family_history": bool(mask & RISK_FAMILY_HISTORY)
         }
 
 
 class ClassificationResult(BaseModel):
     """Resultado da classificação ML"""
+    model_config = {"frozen": True}
+    
     is_outlier: bool = Field(..., description="Se o paciente é um outlier")
     confidence: Optional[float] = Field(
         None, 
@@ -116,6 +159,8 @@ class ClassificationResult(BaseModel):
 
 class RecommendationData(BaseModel):
     """Dados da recomendação gerada"""
+    model_config = {"frozen": True}
+    
     content: str = Field(..., description="Conteúdo da recomendação")
     priority: str = Field(default="normal", description="Prioridade da ação")
     generated_by: str = Field(default="system", description="Sistema que gerou")
@@ -128,7 +173,7 @@ class RecommendationData(BaseModel):
 class PatientAnalysisResponse(BaseModel):
     """DTO de resposta da análise do paciente"""
     analysis_id: str = Field(
-        default_factory=lambda: str(uuid.uuid4()),
+        default_factory=lambda: uuid.uuid4().hex,
         description="ID único da análise"
     )
     patient_data: PatientDataInput = Field(..., description="Dados do paciente")
@@ -159,9 +204,10 @@ class PatientAnalysisResponse(BaseModel):
         return self.classification.confidence
     
     model_config = {
+        "frozen": True,
         "json_schema_extra": {
             "example": {
-                "analysis_id": "123e4567-e89b-12d3-a456-426614174000",
+                "analysis_id": "123e4567e89b12d3a456426614174000",
                 "patient_data": {
                     "idade": 65,
                     "nivel_glicose": 280,
@@ -185,4 +231,38 @@ class PatientAnalysisResponse(BaseModel):
                 "processing_time_ms": 1250
             }
         }
-    }
\ No newline at end of file
+    }
+
+
+# Limite de pacientes por requisição de análise em lote
+BATCH_MAX_PATIENTS = 1000
+
+
+class PatientBatchInput(BaseModel):
+    """DTO para entrada de uma análise em lote"""
+    patients: List[PatientDataInput] = Field(
+        ...,
+        min_length=1,
+        max_length=BATCH_MAX_PATIENTS,
+        description="Pacientes a analisar (a ordem é preservada na resposta)"
+    )
+
+
+class PatientBatchAnalysisResponse(BaseModel):
+    """DTO de resposta da análise em lote"""
+    batch_id: str = Field(
+        default_factory=lambda: uuid.uuid4().hex,
+        description="ID único do lote"
+    )
+    results: List[PatientAnalysisResponse] = Field(
+        ...,
+        description="Análises na mesma ordem dos pacientes enviados"
+    )
+    total_patients: int = Field(..., description="Quantidade de pacientes analisados")
+    outlier_count: int = Field(..., description="Quantidade de pacientes outliers")
+    processing_time_ms: Optional[int] = Field(
+        None,
+        description="Tempo de processamento do lote em milissegundos"
+    )
+    
+    model_config = {"frozen": True}
@@ -1,14 +1,19 @@
 from fastapi import APIRouter, status, Depends
-from fastapi.responses import JSONResponse
-from datetime import datetime
-from typing import Dict, Any
+from fastapi.responses import ORJSONResponse
+from functools import lru_cache
+from typing import Dict, Any, Optional, TYPE_CHECKING
+import asyncio
+import os
 import psutil
 import sys
 
 from app.core.config import settings
-from app.core.logging import get_logger
-from app.services.classification_service import ClassificationService
-from app.services.llm_service import LLMService
+from app.core.clock import iso_now
+from app.core.logging import get_logger, flush_logging
+
+if TYPE_CHECKING:
+    from app.services.classification_service import ClassificationService
+    from app.services.llm_service import LLMService
 
 logger = get_logger(__name__)
 
@@ -21,19 +26,80 @@ router = APIRouter(
     }
 )
 
+# Valores fixos durante a vida do processo, resolvidos na importação
+_DISK_PATH = "C:\\" if sys.platform == "win32" else "/"
+_PY_VERSION = sys.version.split()[0]
+_PID = os.getpid()  # workers importam a app após o fork, então o PID é o do worker
+
+# Intervalo de amostragem das métricas do sistema (segundos)
+_METRICS_SAMPLE_INTERVAL = 5.0
+
+# Última amostra coletada em background (lida pelo /metrics sem bloquear)
+_METRICS_CACHE: Dict[str, Any] = {}
+_sampler_task: Optional[asyncio.Task] = None
+
+def _collect_system_metrics() -> Dict[str, Any]:
+    """Coleta métricas do sistema (cpu_percent não bloqueante, delta desde a última chamada)"""
+    return {
+        "cpu_percent": psutil.cpu_percent(interval=None),
+        "memory_percent": psutil.virtual_memory().percent,
+        "disk_percent": psutil.disk_usage(_DISK_PATH).percent,
+        "python_version": _PY_VERSION,
+        "process_id": _PID
+    }
+
+async def _sample_metrics_loop() -> None:
+    """
+    Atualiza o cache de métricas periodicamente fora do caminho das requisições
+    
+    Aproveita o mesmo ciclo para descarregar o buffer de logs, que de outra forma só
+    seria escrito ao encher, em um ERROR ou no shutdown.
+    """
+    while True:
+        try:
+            _METRICS_CACHE.update(await asyncio.to_thread(_collect_system_metrics))
+        except Exception as e:
+            logger.warning(f"Erro ao obter métricas do sistema: {e}")
+        flush_logging()
+        await asyncio.sleep(_METRICS_SAMPLE_INTERVAL)
+
+def start_metrics_sampler() -> None:
+    """Inicia a tarefa de amostragem de métricas (chamado no startup da aplicação)"""
+    global _sampler_task
+    if _sampler_task is None or _sampler_task.done():
+        # Primeira chamada apenas inicializa a referência do delta de CPU
+        psutil.cpu_percent(interval=None)
+        _sampler_task = asyncio.create_task(_sample_metrics_loop())
+
+async def stop_metrics_sampler() -> None:
+    """Cancela a tarefa de amostragem de métricas (chamado no shutdown da aplicação)"""
+    global _sampler_task
+    if _sampler_task is not None:
+        _sampler_task.cancel()
+        try:
+            await _sampler_task
+        except asyncio.CancelledError:
+            pass
+        _sampler_task = None
+
 def get_system_metrics() -> Dict[str, Any]:
-    """Obtém métricas do sistema"""
-    try:
-        return {
-            "cpu_percent": psutil.cpu_percent(interval=1),
-            "memory_percent": psutil.virtual_memory().percent,
-            "disk_percent": psutil.disk_usage('/').percent if sys.platform != 'win32' else psutil.disk_usage('C:\\').percent,
-            "python_version": sys.version.split()[0],
-            "process_id": psutil.Process().pid
-        }
-    except Exception as e:
-        logger.warning(f"Erro ao obter métricas do sistema: {e}")
+    """Obtém a última amostra de métricas do sistema"""
+    if not _METRICS_CACHE:
         return {"error": "metrics_unavailable"}
+    return dict(_METRICS_CACHE)
+
+@lru_cache(maxsize=1)
+def _classification_singleton() -> "ClassificationService":
+    """Instância única do serviço de classificação para os health checks"""
+    # Import tardio: evita carregar o serviço (e seus SDKs) na importação do router
+    from app.services.classification_service import ClassificationService
+    return ClassificationService()
+
+@lru_cache(maxsize=1)
+def _llm_singleton() -> "LLMService":
+    """Instância única do serviço de LLM para os health checks"""
+    from app.services.llm_service import LLMService
+    return LLMService()
 
 async def check_external_services() -> Dict[str, str]:
     """Verifica saúde dos serviços externos"""
@@ -41,7 +107,7 @@ async def check_external_services() -> Dict[str, str]:
     
     # Verificar serviço de classificação
     try:
-        classification_service = ClassificationService()
+        classification_service = _classification_singleton()
         if classification_service.classification_url:
             # TODO: Implementar ping real ao serviço
             services_status["classification_service"] = "configured"
@@ -52,7 +118,7 @@ async def check_external_services() -> Dict[str, str]:
     
     # Verificar serviço de LLM
     try:
-        llm_service = LLMService()
+        llm_service = _llm_singleton()
         if llm_service.model:
             services_status["llm_service"] = "configured"
         else:
@@ -62,6 +128,15 @@ async def check_external_services() -> Dict[str, str]:
     
     return services_status
 
+# Parte invariante da resposta do health check básico (apenas o timestamp varia)
+_HEALTH_STATIC: Dict[str, Any] = {
+    "status": "healthy",
+    "service": settings.APP_NAME,
+    "version": settings.APP_VERSION,
+    "environment": settings.ENVIRONMENT,
+    "uptime_check": "ok"
+}
+
 @router.get(
     "/",
     summary="Health Check Básico",
@@ -69,21 +144,14 @@ async def check_external_services() -> Dict[str, str]:
 )
 async def health_check() -> Dict[str, Any]:
     """Endpoint de health check básico"""
-    return {
-        "status": "healthy",
-        "service": settings.APP_NAME,
-        "version": settings.APP_VERSION,
-        "environment": settings.ENVIRONMENT,
-        "timestamp": datetime.now().isoformat(),
-        "uptime_check": "ok"
-    }
+    return {**_HEALTH_STATIC, "timestamp": iso_now()}
 
 @router.get(
     "/ready",
     summary="Readiness Check",
     description="Verifica se o serviço está pronto para receber requisições"
 )
-async def readiness_check() -> JSONResponse:
+async def readiness_check() -> ORJSONResponse:
     """Endpoint de readiness check com verificação de dependências"""
     
     try:
@@ -100,7 +168,7 @@ async def readiness_check() -> JSONResponse:
             "service": settings.APP_NAME,
             "version": settings.APP_VERSION,
             "environment": settings.ENVIRONMENT,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": iso_now(),
             "services": {
                 "api": "online",
                 **services_status
@@ -114,19 +182,19 @@ async def readiness_check() -> JSONResponse:
         
         status_code = status.HTTP_200_OK if all_healthy else status.HTTP_200_OK
         
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status_code,
             content=response_data
         )
         
     except Exception as e:
         logger.error(f"Erro no readiness check: {e}")
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             content={
                 "status": "not_ready",
                 "service": settings.APP_NAME,
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": iso_now(),
                 "error": str(e)
             }
         )
@@ -141,27 +209,28 @@ async def liveness_check() -> Dict[str, Any]:
     return {
         "status": "alive",
         "service": settings.APP_NAME,
-        "timestamp": datetime.now().isoformat(),
-        "process_id": psutil.Process().pid
+        "timestamp": iso_now(),
+        "process_id": _PID
     }
 
 @router.get(
     "/metrics",
     summary="Métricas do Sistema",
-    description="Retorna métricas detalhadas do sistema (para monitoring)"
+    description="Retorna métricas detalhadas do sistema (para monitoring)",
+    response_class=ORJSONResponse
 )
-async def metrics_endpoint() -> Dict[str, Any]:
+async def metrics_endpoint() -> ORJSONResponse:
     """Endpoint de métricas para monitoring"""
     
     try:
         system_metrics = get_system_metrics()
         services_status = await check_external_services()
         
-        return {
+        return ORJSONResponse({
             "service": settings.APP_NAME,
             "version": settings.APP_VERSION,
             "environment": settings.ENVIRONMENT,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": iso_now(),
             "system": system_metrics,
             "services": services_status,
             "configuration": {
@@ -169,15 +238,15 @@ async def metrics_endpoint() -> Dict[str, Any]:
                 "log_level": settings.LOG_LEVEL,
                 "api_prefix": settings.API_V1_PREFIX
             }
-        }
+        })
         
     except Exception as e:
         logger.error(f"Erro ao obter métricas: {e}")
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             content={
                 "error": "metrics_unavailable",
                 "message": str(e),
-                "timestamp": datetime.now().isoformat()
+                "timestamp": iso_now()
             }
         )
\ No newline at end of file
@@ -1,24 +1,29 @@
 from fastapi import APIRouter, HTTPException, Depends, Request, Response, status
-from fastapi.responses import JSONResponse
-from typing import Dict, Any
+from fastapi.responses import ORJSONResponse
+from typing import Dict, Any, Optional, Tuple
+import logging
 import time
-import uuid
+from os import urandom
 
-from app.models.patient import PatientDataInput, PatientAnalysisResponse
-from app.services.patient_service import PatientService
-from app.core.exceptions import (
-    ConectaSaudeException, 
-    ValidationException, 
-    ClassificationServiceException,
-    LLMServiceException
+from app.models.patient import (
+    PatientDataInput,
+    PatientAnalysisResponse,
+    PatientBatchInput,
+    PatientBatchAnalysisResponse
 )
+from app.services.patient_service import PatientService
+from app.core.exceptions import ConectaSaudeException
 from app.core.logging import get_logger
 from app.core.config import settings
+from app.core.context import request_id_var
 
 logger = get_logger(__name__)
 
+# Prefixo resolvido uma única vez na importação
+_API_PREFIX = settings.API_V1_PREFIX
+
 router = APIRouter(
-    prefix=f"{settings.API_V1_PREFIX}/patient",
+    prefix=f"{_API_PREFIX}/patient",
     tags=["patient"],
     responses={
         400: {"description": "Dados inválidos"},
@@ -27,6 +32,91 @@ router = APIRouter(
     }
 )
 
+# Respostas por error_code: (status HTTP, erro público, mensagem pública, mensagem de log).
+# Mensagem pública None repassa a mensagem da exceção; códigos ausentes viram 422.
+_ERROR_RESPONSES: Dict[str, Tuple[int, str, Optional[str], str]] = {
+    "VALIDATION_ERROR": (
+        status.HTTP_400_BAD_REQUEST,
+        "VALIDATION_ERROR",
+        None,
+        "Erro de validação"
+    ),
+    "CLASSIFICATION_ERROR": (
+        status.HTTP_503_SERVICE_UNAVAILABLE,
+        "CLASSIFICATION_SERVICE_ERROR",
+        "Serviço de classificação temporiamente indisponível",
+        "Erro no serviço de classificação"
+    ),
+    "LLM_ERROR": (
+        status.HTTP_206_PARTIAL_CONTENT,
+        "LLM_SERVICE_ERROR",
+        "Análise concluída com recomendação básica",
+        "Erro no serviço de LLM"
+    ),
+}
+
+def _business_http_exception(e: ConectaSaudeException, request_id: str) -> HTTPException:
+    """Converte uma exceção de negócio na HTTPException correspondente (ver _ERROR_RESPONSES)"""
+    mapped = _ERROR_RESPONSES.get(e.error_code)
+    
+    if mapped is None:
+        logger.error(
+            "Erro de negócio",
+            extra={
+                "request_id": request_id,
+                "error_code": e.error_code,
+                "error": e.message
+            }
+        )
+        return HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={
+                "error": e.error_code,
+                "message": e.message,
+                "details": e.details,
+                "request_id": request_id
+            }
+        )
+    
+    status_code, error, message, log_message = mapped
+    detail = {"error": error, "message": message or e.message}
+    
+    if e.error_code == "VALIDATION_ERROR":
+        field = getattr(e, 'field', None)
+        logger.warning(
+            log_message,
+            extra={"request_id": request_id, "error": e.message, "field": field}
+        )
+        detail["field"] = field
+    else:
+        # LLM não é crítico: o LLM_ERROR sinaliza recomendação básica (206)
+        logger.error(
+            log_message,
+            extra={"request_id": request_id, "error": e.message}
+        )
+    
+    detail["request_id"] = request_id
+    return HTTPException(status_code=status_code, detail=detail)
+
+def _internal_http_exception(e: Exception, request_id: str) -> HTTPException:
+    """Converte um erro inesperado em HTTPException 500"""
+    logger.error(
+        "Erro interno inesperado",
+        extra={
+            "request_id": request_id,
+            "error": str(e),
+            "error_type": type(e).__name__
+        }
+    )
+    return HTTPException(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        detail={
+            "error": "INTERNAL_SERVER_ERROR",
+            "message": "Erro interno do servidor",
+            "request_id": request_id
+        }
+    )
+
 # Dependency Injection
 def get_patient_service() -> PatientService:
     """Factory para o serviço de pacientes"""
@@ -35,44 +125,46 @@ def get_patient_service() -> PatientService:
 # Middleware para logging de requests
 async def log_request_middleware(request: Request, call_next):
     """Middleware para logging de requisições"""
-    request_id = str(uuid.uuid4())
-    start_time = time.time()
+    # Reaproveita o ID enviado pelo proxy/cliente, se houver
+    request_id = request.headers.get("x-request-id") or urandom(16).hex()
+    start_ns = time.perf_counter_ns()
     
     # Adicionar request_id ao contexto
     request.state.request_id = request_id
     
-    logger.info(f"Processing request {request_id}: {request.method} {request.url}")
+    logger.info("Processing request %s: %s %s", request_id, request.method, request.url)
     
     response = await call_next(request)
     
-    process_time = time.time() - start_time
-    logger.info(
-        "Request processado",
-        extra={
-            "request_id": request_id,
-            "process_time_ms": int(process_time * 1000),
-            "status_code": response.status_code
-        }
-    )
+    process_time_us = (time.perf_counter_ns() - start_ns) // 1_000
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            "Request processado",
+            extra={
+                "request_id": request_id,
+                "process_time_ms": process_time_us // 1_000,
+                "status_code": response.status_code
+            }
+        )
     
     # Adicionar headers de response
     response.headers["X-Request-ID"] = request_id
-    response.headers["X-Process-Time"] = f"{process_time:.3f}s"
+    response.headers["X-Process-Time"] = f"{process_time_us}us"
     
     return response
 
 @router.post(
     "/analyze", 
     response_model=PatientAnalysisResponse,
+    response_class=ORJSONResponse,
     status_code=status.HTTP_200_OK,
     summary="Analisar Paciente",
     description="Analisa dados de um paciente e gera recomendações se necessário"
 )
 async def analyze_patient(
     patient_data: PatientDataInput,
-    request: Request,
     patient_service: PatientService = Depends(get_patient_service)
-) -> PatientAnalysisResponse:
+) -> ORJSONResponse:
     """
     **Endpoint Principal - Análise de Paciente**
     
@@ -89,120 +181,80 @@ async def analyze_patient(
     - Geração de planos de ação
     """
     
-    request_id = getattr(request.state, 'request_id', str(uuid.uuid4()))
+    request_id = request_id_var.get() or urandom(16).hex()
     
     try:
-        logger.info(
-            "Iniciando análise de paciente",
-            extra={
-                "request_id": request_id,
-                "patient_age": patient_data.idade,
-                "glucose_level": patient_data.nivel_glicose,
-                "blood_pressure": f"{patient_data.pressao_sistolica}/{patient_data.pressao_diastolica}",
-                "family_history": patient_data.historico_familiar
-            }
-        )
+        # Extras só são montados quando o nível INFO está habilitado
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "Iniciando análise de paciente",
+                extra={
+                    "request_id": request_id,
+                    "patient_age": patient_data.idade,
+                    "glucose_level": patient_data.nivel_glicose,
+                    "blood_pressure": patient_data.blood_pressure_formatted,
+                    "family_history": patient_data.historico_familiar
+                }
+            )
         
         # Chama o Application Service
         result = await patient_service.analyze_patient(patient_data)
         
-        logger.info(
-            "Análise concluída com sucesso",
-            extra={
-                "request_id": request_id,
-                "analysis_id": result.analysis_id,
-                "is_outlier": result.is_outlier,
-                "risk_level": result.classification.risk_level,
-                "processing_time_ms": result.processing_time_ms
-            }
-        )
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "Análise concluída com sucesso",
+                extra={
+                    "request_id": request_id,
+                    "analysis_id": result.analysis_id,
+                    "is_outlier": result.is_outlier,
+                    "risk_level": result.classification.risk_level,
+                    "processing_time_ms": result.processing_time_ms
+                }
+            )
         
-        return result
+        # Serialização direta via orjson (datetime/enum nativos), sem jsonable_encoder
+        return ORJSONResponse(content=result.model_dump())
         
-    except ValidationException as e:
-        logger.warning(
-            "Erro de validação",
-            extra={
-                "request_id": request_id,
-                "error": e.message,
-                "field": getattr(e, 'field', None)
-            }
-        )
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail={
-                "error": "VALIDATION_ERROR",
-                "message": e.message,
-                "field": getattr(e, 'field', None),
-                "request_id": request_id
-            }
-        )
+    except ConectaSaudeException as e:
+        raise _business_http_exception(e, request_id)
     
-    except ClassificationServiceException as e:
-        logger.error(
-            "Erro no serviço de classificação",
-            extra={"request_id": request_id, "error": e.message}
-        )
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail={
-                "error": "CLASSIFICATION_SERVICE_ERROR",
-                "message": "Serviço de classificação temporiamente indisponível",
-                "request_id": request_id
-            }
-        )
+    except Exception as e:
+        raise _internal_http_exception(e, request_id)
+
+@router.post(
+    "/analyze/batch",
+    response_model=PatientBatchAnalysisResponse,
+    response_class=ORJSONResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Analisar Lote de Pacientes",
+    description="Analisa vários pacientes em uma única requisição, preservando a ordem"
+)
+async def analyze_patient_batch(
+    batch: PatientBatchInput,
+    patient_service: PatientService = Depends(get_patient_service)
+) -> ORJSONResponse:
+    """
+    **Análise em Lote**
     
-    except LLMServiceException as e:
-        logger.error(
-            "Erro no serviço de LLM",
-            extra={"request_id": request_id, "error": e.message}
-        )
-        # LLM não é crítico, continuamos com fallback
-        raise HTTPException(
-            status_code=status.HTTP_206_PARTIAL_CONTENT,
-            detail={
-                "error": "LLM_SERVICE_ERROR",
-                "message": "Análise concluída com recomendação básica",
-                "request_id": request_id
-            }
-        )
+    Indicado para triagens com muitos pacientes (ex.: planilhas exportadas):
+    
+    1. **Classificação**: Todo o lote é classificado de uma vez
+    2. **Recomendação**: Gerada apenas para outliers, com chamadas ao LLM em paralelo
+    3. **Resposta**: Resultados na mesma ordem dos pacientes enviados
+    """
+    
+    request_id = request_id_var.get() or urandom(16).hex()
     
+    try:
+        result = await patient_service.analyze_batch(batch.patients)
+        
+        return ORJSONResponse(content=result.model_dump())
+        
     except ConectaSaudeException as e:
-        logger.error(
-            "Erro de negócio",
-            extra={
-                "request_id": request_id,
-                "error_code": e.error_code,
-                "error": e.message
-            }
-        )
-        raise HTTPException(
-            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            detail={
-                "error": e.error_code,
-                "message": e.message,
-                "details": e.details,
-                "request_id": request_id
-            }
-        )
+        raise _business_http_exception(e, request_id)
     
     except Exception as e:
-        logger.error(
-            "Erro interno inesperado",
-            extra={
-                "request_id": request_id,
-                "error": str(e),
-                "error_type": type(e).__name__
-            }
-        )
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail={
-                "error": "INTERNAL_SERVER_ERROR",
-                "message": "Erro interno do servidor",
-                "request_id": request_id
-            }
-        )
+        raise _internal_http_exception(e, request_id)
 
 @router.get(
     "/health",
@@ -222,7 +274,7 @@ async def patient_service_health(
         }
     except Exception as e:
         logger.error(f"Health check falhou: {e}")
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             content={
                 "status": "unhealthy",
@@ -231,6 +283,43 @@ async def patient_service_health(
             }
         )
 
+# Resposta do /test depende apenas de configurações imutáveis: montada uma única vez
+_TEST_RESPONSE: Dict[str, Any] = {
+    "message": "🏥 Serviço de Pacientes - Online",
+    "version": settings.APP_VERSION,
+    "environment": settings.ENVIRONMENT,
+    "endpoints": {
+        "analyze": f"POST {_API_PREFIX}/patient/analyze - Analisa paciente",
+        "analyze_batch": f"POST {_API_PREFIX}/patient/analyze/batch - Analisa lote de pacientes",
+        "health": f"GET {_API_PREFIX}/patient/health - Health check",
+        "test": f"GET {_API_PREFIX}/patient/test - Este endpoint"
+    },
+    "example_request": {
+        "method": "POST",
+        "url": f"{_API_PREFIX}/patient/analyze",
+        "body": {
+            "idade": 65,
+            "nivel_glicose": 280.5,
+            "pressao_sistolica": 160,
+            "pressao_diastolica": 95,
+            "historico_familiar": True
+        }
+    },
+    "expected_response": {
+        "analysis_id": "uuid",
+        "patient_data": "...",
+        "classification": {
+            "is_outlier": True,
+            "confidence": 0.89,
+            "risk_level": "high"
+        },
+        "recommendation": {
+            "content": "Ações recomendadas...",
+            "priority": "urgent"
+        }
+    }
+}
+
 @router.get(
     "/test",
     summary="Endpoint de Teste",
@@ -242,37 +331,4 @@ async def test_endpoint() -> Dict[str, Any]:
     
     Retorna informações básicas sobre o serviço e exemplos de uso.
     """
-    return {
-        "message": "🏥 Serviço de Pacientes - Online",
-        "version": settings.APP_VERSION,
-        "environment": settings.ENVIRONMENT,
-        "endpoints": {
-            "analyze": f"POST {settings.API_V1_PREFIX}/patient/analyze - Analisa paciente",
-            "health": f"GET {settings.API_V1_PREFIX}/patient/health - Health check",
-            "test": f"GET {settings.API_V1_PREFIX}/patient/test - Este endpoint"
-        },
-        "example_request": {
-            "method": "POST",
-            "url": f"{settings.API_V1_PREFIX}/patient/analyze",
-            "body": {
-                "idade": 65,
-                "nivel_glicose": 280.5,
-                "pressao_sistolica": 160,
-                "pressao_diastolica": 95,
-                "historico_familiar": True
-            }
-        },
-        "expected_response": {
-            "analysis_id": "uuid",
-            "patient_data": "...",
-            "classification": {
-                "is_outlier": True,
-                "confidence": 0.89,
-                "risk_level": "high"
-            },
-            "recommendation": {
-                "content": "Ações recomendadas...",
-                "priority": "urgent"
-            }
-        }
-    }
\ No newline at end of file
+    return _TEST_RESPONSE
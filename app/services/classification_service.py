@@ -1,6 +1,10 @@
+import logging
+import asyncio
 import httpx
-from typing import Dict, Any
-from datetime import datetime
+import orjson
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+from app.core.clock import cached_now
 from app.models.patient import ClassificationResult, RiskLevel
 from app.core.config import settings
 from app.core.interfaces import IClassificationService
@@ -9,6 +13,128 @@ from app.core.logging import get_logger
 
 logger = get_logger(__name__)
 
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Cliente HTTP compartilhado entre requisições (pool de conexões keep-alive)
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client(timeout: float) -> httpx.AsyncClient:
+    """Retorna o cliente HTTP compartilhado, criando-o no primeiro uso"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=128)
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Fecha o cliente HTTP compartilhado (chamado no shutdown da aplicação)"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+# Códigos inteiros de risco retornados por _calc_risk (índice em _RISK_BY_CODE)
+RISK_CODE_LOW = 0
+RISK_CODE_MEDIUM = 1
+RISK_CODE_HIGH = 2
+RISK_CODE_CRITICAL = 3
+
+_RISK_BY_CODE = (RiskLevel.LOW, RiskLevel.MEDIUM, RiskLevel.HIGH, RiskLevel.CRITICAL)
+
+
+# Confiança base por nível de risco
+_BASE_CONFIDENCE = {
+    RiskLevel.CRITICAL: 0.95,
+    RiskLevel.HIGH: 0.85,
+    RiskLevel.MEDIUM: 0.75,
+    RiskLevel.LOW: 0.70
+}
+
+# Campos obrigatórios, na ordem dos bits da máscara de completude
+_REQUIRED_FIELDS = ("idade", "nivel_glicose", "pressao_sistolica", "pressao_diastolica")
+
+# Confiança ajustada pela completude dos dados, para cada (nível, máscara de campos presentes)
+_CONFIDENCE_TABLE: Dict[Tuple[RiskLevel, int], float] = {
+    (risk_level, mask): min(
+        base * (bin(mask).count("1") / len(_REQUIRED_FIELDS)), 0.99
+    )
+    for risk_level, base in _BASE_CONFIDENCE.items()
+    for mask in range(1 << len(_REQUIRED_FIELDS))
+}
+
+
+def _calc_risk(
+    idade: int,
+    glicose: float,
+    sistolica: int,
+    diastolica: int,
+    historico: bool
+) -> int:
+    """Núcleo das regras de risco sobre valores já extraídos; retorna um RISK_CODE_*"""
+    
+    # Critérios críticos
+    if (
+        glicose > 300 or
+        sistolica > 180 or
+        diastolica > 110
+    ):
+        return RISK_CODE_CRITICAL
+    
+    # Critérios de alto risco, um bit por critério (contagem via popcount)
+    critical_conditions = (
+        (glicose > 200)  # Diabetes severa
+        | (sistolica > 160) << 1  # Hipertensão severa
+        | (diastolica > 100) << 2  # Hipertensão diastólica severa
+        | (idade > 70 and glicose > 140) << 3  # Idoso diabético
+        | (idade > 80) << 4  # Idade muito avançada
+    ).bit_count()
+    
+    if critical_conditions >= 2:
+        return RISK_CODE_HIGH
+    elif critical_conditions == 1 or (historico and (glicose > 126 or sistolica > 140)):
+        return RISK_CODE_MEDIUM
+    else:
+        return RISK_CODE_LOW
+
+
+def _completeness_mask(patient_data: Dict[str, Any]) -> int:
+    """Bitmask de completude dos campos obrigatórios"""
+    return (
+        (patient_data.get("idade") is not None)
+        | (patient_data.get("nivel_glicose") is not None) << 1
+        | (patient_data.get("pressao_sistolica") is not None) << 2
+        | (patient_data.get("pressao_diastolica") is not None) << 3
+    )
+
+
+@lru_cache(maxsize=4096)
+def _local_classify_cached(
+    idade: int,
+    glicose: float,
+    sistolica: int,
+    diastolica: int,
+    historico: bool,
+    mask: int
+) -> Tuple[RiskLevel, bool, float]:
+    """
+    (nível de risco, outlier, confiança) memoizados pelos valores exatos das entradas
+    
+    Os sinais vitais chegam como inteiros (ou com poucas casas decimais), então
+    pacientes de triagem repetem combinações com frequência. As entradas não são
+    arredondadas em faixas para não deslocar os limiares clínicos das regras.
+    """
+    risk_level = _RISK_BY_CODE[_calc_risk(idade, glicose, sistolica, diastolica, historico)]
+    return (
+        risk_level,
+        ClassificationStrategy.is_outlier(risk_level),
+        _CONFIDENCE_TABLE[(risk_level, mask)]
+    )
+
 
 class ClassificationStrategy:
     """Estratégia para classificação de risco (Pattern Strategy)"""
@@ -16,35 +142,29 @@ class ClassificationStrategy:
     @staticmethod
     def calculate_risk_level(patient_data: Dict[str, Any]) -> RiskLevel:
         """Calcula nível de risco baseado em critérios médicos"""
-        idade = patient_data.get("idade", 0)
-        glicose = patient_data.get("nivel_glicose", 0)
-        sistolica = patient_data.get("pressao_sistolica", 0)
-        diastolica = patient_data.get("pressao_diastolica", 0)
-        historico = patient_data.get("historico_familiar", False)
-        
-        # Critérios críticos
-        if (
-            glicose > 300 or
-            sistolica > 180 or
-            diastolica > 110
-        ):
-            return RiskLevel.CRITICAL
-        
-        # Critérios de alto risco
-        critical_conditions = sum([
-            glicose > 200,  # Diabetes severa
-            sistolica > 160,  # Hipertensão severa
-            diastolica > 100,  # Hipertensão diastólica severa
-            idade > 70 and glicose > 140,  # Idoso diabético
-            idade > 80,  # Idade muito avançada
-        ])
-        
-        if critical_conditions >= 2:
-            return RiskLevel.HIGH
-        elif critical_conditions == 1 or (historico and (glicose > 126 or sistolica > 140)):
-            return RiskLevel.MEDIUM
-        else:
-            return RiskLevel.LOW
+        return _RISK_BY_CODE[_calc_risk(
+            patient_data.get("idade", 0),
+            patient_data.get("nivel_glicose", 0),
+            patient_data.get("pressao_sistolica", 0),
+            patient_data.get("pressao_diastolica", 0),
+            patient_data.get("historico_familiar", False)
+        )]
+    
+    @staticmethod
+    def calculate_risk_level_batch(
+        patients: Sequence[Dict[str, Any]]
+    ) -> List[RiskLevel]:
+        """Calcula o nível de risco de vários pacientes em uma única passada"""
+        return [
+            _RISK_BY_CODE[_calc_risk(
+                p.get("idade", 0),
+                p.get("nivel_glicose", 0),
+                p.get("pressao_sistolica", 0),
+                p.get("pressao_diastolica", 0),
+                p.get("historico_familiar", False)
+            )]
+            for p in patients
+        ]
     
     @staticmethod
     def is_outlier(risk_level: RiskLevel) -> bool:
@@ -53,21 +173,8 @@ class ClassificationStrategy:
     
     @staticmethod
     def calculate_confidence(risk_level: RiskLevel, patient_data: Dict[str, Any]) -> float:
-        """Calcula confiança da classificação"""
-        base_confidence = {
-            RiskLevel.CRITICAL: 0.95,
-            RiskLevel.HIGH: 0.85,
-            RiskLevel.MEDIUM: 0.75,
-            RiskLevel.LOW: 0.70
-        }
-        
-        confidence = base_confidence[risk_level]
-        
-        # Ajustar confiança baseada em completude dos dados
-        required_fields = ["idade", "nivel_glicose", "pressao_sistolica", "pressao_diastolica"]
-        completeness = sum(1 for field in required_fields if patient_data.get(field) is not None) / len(required_fields)
-        
-        return min(confidence * completeness, 0.99)
+        """Calcula confiança da classificação (consulta em tabela pré-calculada)"""
+        return _CONFIDENCE_TABLE[(risk_level, _completeness_mask(patient_data))]
 
 
 class ClassificationService(IClassificationService):
@@ -81,14 +188,31 @@ class ClassificationService(IClassificationService):
     async def classify(self, patient_data: Dict[str, Any]) -> ClassificationResult:
         """Classifica paciente usando serviço ML externo ou fallback local"""
         
-        logger.info(
-            "Iniciando classificação",
-            extra={
-                "patient_age": patient_data.get("idade"),
-                "glucose_level": patient_data.get("nivel_glicose"),
-                "has_external_service": bool(self.classification_url)
-            }
-        )
+        # Caminho rápido: sem serviço externo, pacientes de baixo risco (a maioria
+        # na triagem) são resolvidos direto pelo núcleo de regras, sem logs extras
+        if not self.classification_url and _calc_risk(
+            patient_data.get("idade", 0),
+            patient_data.get("nivel_glicose", 0),
+            patient_data.get("pressao_sistolica", 0),
+            patient_data.get("pressao_diastolica", 0),
+            patient_data.get("historico_familiar", False)
+        ) == RISK_CODE_LOW:
+            return ClassificationResult.model_construct(
+                is_outlier=False,
+                confidence=self.strategy.calculate_confidence(RiskLevel.LOW, patient_data),
+                risk_level=RiskLevel.LOW,
+                classification_timestamp=cached_now()
+            )
+        
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "Iniciando classificação",
+                extra={
+                    "patient_age": patient_data.get("idade"),
+                    "glucose_level": patient_data.get("nivel_glicose"),
+                    "has_external_service": bool(self.classification_url)
+                }
+            )
         
         if not self.classification_url:
             logger.info("Usando classificação local (sem serviço externo configurado)")
@@ -106,26 +230,76 @@ class ClassificationService(IClassificationService):
                 details={"original_error": str(e)}
             )
     
+    async def classify_many(
+        self, patients: Sequence[Dict[str, Any]]
+    ) -> List[ClassificationResult]:
+        """Classifica vários pacientes, preservando a ordem de entrada"""
+        
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "Iniciando classificação em lote",
+                extra={
+                    "batch_size": len(patients),
+                    "has_external_service": bool(self.classification_url)
+                }
+            )
+        
+        if self.classification_url:
+            # Serviço externo classifica um paciente por requisição: dispara em paralelo,
+            # limitado para não esgotar o pool de conexões do cliente HTTP compartilhado
+            semaphore = asyncio.Semaphore(settings.BATCH_CLASSIFICATION_CONCURRENCY)
+            
+            async def classify_bounded(patient_data: Dict[str, Any]) -> ClassificationResult:
+                async with semaphore:
+                    return await self.classify(patient_data)
+            
+            return list(await asyncio.gather(*(classify_bounded(p) for p in patients)))
+        
+        # Local: uma passada de regras, um timestamp e um log para o lote inteiro
+        risk_levels = self.strategy.calculate_risk_level_batch(patients)
+        timestamp = cached_now()
+        results = [
+            ClassificationResult.model_construct(
+                is_outlier=self.strategy.is_outlier(risk_level),
+                confidence=self.strategy.calculate_confidence(risk_level, patient_data),
+                risk_level=risk_level,
+                classification_timestamp=timestamp
+            )
+            for risk_level, patient_data in zip(risk_levels, patients)
+        ]
+        
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "Classificação local em lote concluída",
+                extra={
+                    "batch_size": len(results),
+                    "outliers": sum(1 for r in results if r.is_outlier)
+                }
+            )
+        
+        return results
+    
     async def _external_classification(self, patient_data: Dict[str, Any]) -> ClassificationResult:
         """Classificação usando serviço ML externo"""
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    f"{self.classification_url}/classify",
-                    json=patient_data,
-                    headers={"Content-Type": "application/json"}
-                )
-                response.raise_for_status()
-                data = response.json()
-                
-                logger.info("Classificação externa concluída com sucesso")
-                
-                return ClassificationResult(
-                    is_outlier=data.get("is_outlier", False),
-                    confidence=data.get("confidence", 0.5),
-                    risk_level=data.get("risk_level", RiskLevel.MEDIUM),
-                    classification_timestamp=datetime.now()
-                )
+            client = get_http_client(self.timeout)
+            response = await client.post(
+                f"{self.classification_url}/classify",
+                content=orjson.dumps(patient_data),
+                headers=_JSON_HEADERS
+            )
+            response.raise_for_status()
+            data = orjson.loads(response.content)
+            
+            logger.info("Classificação externa concluída com sucesso")
+            
+            # Dados de serviço externo passam pela validação do modelo
+            return ClassificationResult(
+                is_outlier=data.get("is_outlier", False),
+                confidence=data.get("confidence", 0.5),
+                risk_level=data.get("risk_level", RiskLevel.MEDIUM),
+                classification_timestamp=cached_now()
+            )
                 
         except httpx.TimeoutException:
             raise ExternalServiceException(
@@ -144,22 +318,29 @@ class ClassificationService(IClassificationService):
     async def _local_classification(self, patient_data: Dict[str, Any]) -> ClassificationResult:
         """Classificação local usando regras de negócio"""
         
-        risk_level = self.strategy.calculate_risk_level(patient_data)
-        is_outlier = self.strategy.is_outlier(risk_level)
-        confidence = self.strategy.calculate_confidence(risk_level, patient_data)
-        
-        logger.info(
-            "Classificação local concluída",
-            extra={
-                "risk_level": risk_level,
-                "is_outlier": is_outlier,
-                "confidence": confidence
-            }
+        # Apenas o timestamp é gerado a cada chamada; o restante vem do cache
+        risk_level, is_outlier, confidence = _local_classify_cached(
+            patient_data.get("idade", 0),
+            patient_data.get("nivel_glicose", 0),
+            patient_data.get("pressao_sistolica", 0),
+            patient_data.get("pressao_diastolica", 0),
+            patient_data.get("historico_familiar", False),
+            _completeness_mask(patient_data)
         )
         
-        return ClassificationResult(
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "Classificação local concluída",
+                extra={
+                    "risk_level": risk_level,
+                    "is_outlier": is_outlier,
+                    "confidence": confidence
+                }
+            )
+        
+        return ClassificationResult.model_construct(
             is_outlier=is_outlier,
             confidence=confidence,
             risk_level=risk_level,
-            classification_timestamp=datetime.now()
+            classification_timestamp=cached_now()
         )
\ No newline at end of file
@@ -1,5 +1,7 @@
-from typing import Dict, Any, Optional
-from datetime import datetime
+import asyncio
+import logging
+from typing import Dict, Any, Optional, Tuple
+from app.core.clock import cached_now
 from app.models.patient import RecommendationData, ClassificationResult, RiskLevel
 from app.core.config import settings
 from app.core.interfaces import ILLMService
@@ -13,112 +15,158 @@ genai = None
 logger = get_logger(__name__)
 
 
+# Recomendações locais já montadas, por combinação discreta de entradas
+# (nível de risco, outlier, faixa de glicose, faixa de pressão, faixa etária, histórico).
+# O espaço de chaves é finito (< 1000 combinações), então o cache não cresce sem limite.
+_LOCAL_RECOMMENDATION_CACHE: Dict[Tuple[Optional[RiskLevel], bool, int, int, int, bool], str] = {}
+
+
+# Itens da recomendação. Os textos fixos são constantes do módulo; os que têm
+# campo variável ({}) só são formatados em RecommendationBuilder.build()
+_URGENT_CONTACT_TEMPLATE = "1. 🚨 URGENTE: Contatar paciente em até {}h para agendamento prioritário"
+_MEDICAL_APPOINTMENT_TEMPLATE = "2. 📅 Agendar consulta médica de {}"
+_FOLLOWUP_TEMPLATE = "9. 📞 Retorno obrigatório em {} dias"
+
+_GLUCOSE_CRITICAL_ITEMS = (
+    "3. 🩸 URGENTE: Glicemia capilar de 2/2h até estabilização",
+    "4. 🩸 Solicitar IMEDIATO: Hemoglobina glicada (HbA1c)",
+    "5. 👨‍⚕️ Encaminhamento IMEDIATO para endocrinologista"
+)
+_GLUCOSE_HIGH_ITEMS = (
+    "3. 🩸 Solicitar: Hemoglobina glicada, glicemia de jejum e pós-prandial",
+    "4. 👨‍⚕️ Encaminhar para endocrinologista em 7 dias"
+)
+_PRESSURE_CRITICAL_ITEMS = (
+    "3. 📊 Monitoramento pressão arterial de 2/2h",
+    "4. 💊 Reavaliação URGENTE da medicação anti-hipertensiva",
+    "5. ⚠️ Orientar sobre sinais de crise hipertensiva"
+)
+_PRESSURE_HIGH_ITEMS = (
+    "3. 📊 Monitoramento diário da pressão arterial",
+    "4. 💊 Revisar medicação anti-hipertensiva"
+)
+_ELDERLY_URGENT_ITEM = "6. 👴 Acompanhamento geriátrico URGENTE"
+_ELDERLY_ITEM = "6. 👴 Acompanhamento geriátrico especializado"
+_FAMILY_GUIDANCE_ITEM = "7. 👨‍👩‍👧‍👦 Orientar família sobre fatores de risco hereditários"
+_LIFESTYLE_URGENT_ITEM = "8. 🥗 Orientação nutricional URGENTE"
+_LIFESTYLE_ITEM = "8. 🥗 Orientar sobre hábitos alimentares e exercícios"
+
+
 class RecommendationBuilder:
     """Builder para construção de recomendações (Pattern Builder)"""
     
+    # Máximo de itens que uma recomendação pode conter (soma de todas as etapas)
+    _MAX_ITEMS = 12
+    
     def __init__(self):
-        self.recommendations = []
+        # Cada posição guarda (texto ou template, valor do template ou None)
+        self._buf = [None] * self._MAX_ITEMS
+        self._n = 0
         self.priority = "normal"
     
+    def _push(self, *items: str) -> None:
+        """Grava itens de texto fixo no buffer pré-alocado"""
+        for item in items:
+            self._buf[self._n] = (item, None)
+            self._n += 1
+    
+    def _push_template(self, template: str, value: Any) -> None:
+        """Grava um item com campo variável, formatado apenas em build()"""
+        self._buf[self._n] = (template, value)
+        self._n += 1
+    
     def add_urgent_contact(self, hours: int = 24) -> 'RecommendationBuilder':
-        self.recommendations.append(
-            f"1. 🚨 URGENTE: Contatar paciente em até {hours}h para agendamento prioritário"
-        )
+        self._push_template(_URGENT_CONTACT_TEMPLATE, hours)
         self.priority = "urgent"
         return self
     
     def add_medical_appointment(self, urgency: str = "urgência") -> 'RecommendationBuilder':
-        self.recommendations.append(f"2. 📅 Agendar consulta médica de {urgency}")
+        self._push_template(_MEDICAL_APPOINTMENT_TEMPLATE, urgency)
         return self
     
     def add_glucose_monitoring(self, level: float) -> 'RecommendationBuilder':
         if level > 300:
-            self.recommendations.extend([
-                "3. 🩸 URGENTE: Glicemia capilar de 2/2h até estabilização",
-                "4. 🩸 Solicitar IMEDIATO: Hemoglobina glicada (HbA1c)",
-                "5. 👨‍⚕️ Encaminhamento IMEDIATO para endocrinologista"
-            ])
+            self._push(*_GLUCOSE_CRITICAL_ITEMS)
         elif level > 200:
-            self.recommendations.extend([
-                "3. 🩸 Solicitar: Hemoglobina glicada, glicemia de jejum e pós-prandial",
-                "4. 👨‍⚕️ Encaminhar para endocrinologista em 7 dias"
-            ])
+            self._push(*_GLUCOSE_HIGH_ITEMS)
         return self
     
     def add_pressure_monitoring(self, systolic: int, diastolic: int) -> 'RecommendationBuilder':
         if systolic > 180 or diastolic > 110:
-            self.recommendations.extend([
-                "3. 📊 Monitoramento pressão arterial de 2/2h",
-                "4. 💊 Reavaliação URGENTE da medicação anti-hipertensiva",
-                "5. ⚠️ Orientar sobre sinais de crise hipertensiva"
-            ])
+            self._push(*_PRESSURE_CRITICAL_ITEMS)
         elif systolic > 160 or diastolic > 100:
-            self.recommendations.extend([
-                "3. 📊 Monitoramento diário da pressão arterial",
-                "4. 💊 Revisar medicação anti-hipertensiva"
-            ])
+            self._push(*_PRESSURE_HIGH_ITEMS)
         return self
     
     def add_elderly_care(self, age: int) -> 'RecommendationBuilder':
         if age > 80:
-            self.recommendations.append("6. 👴 Acompanhamento geriátrico URGENTE")
+            self._push(_ELDERLY_URGENT_ITEM)
         elif age > 65:
-            self.recommendations.append("6. 👴 Acompanhamento geriátrico especializado")
+            self._push(_ELDERLY_ITEM)
         return self
     
     def add_family_guidance(self, has_family_history: bool) -> 'RecommendationBuilder':
         if has_family_history:
-            self.recommendations.append(
-                "7. 👨‍👩‍👧‍👦 Orientar família sobre fatores de risco hereditários"
-            )
+            self._push(_FAMILY_GUIDANCE_ITEM)
         return self
     
     def add_lifestyle_guidance(self, risk_level: RiskLevel) -> 'RecommendationBuilder':
         if risk_level == RiskLevel.CRITICAL:
-            self.recommendations.append("8. 🥗 Orientação nutricional URGENTE")
+            self._push(_LIFESTYLE_URGENT_ITEM)
         else:
-            self.recommendations.append("8. 🥗 Orientar sobre hábitos alimentares e exercícios")
+            self._push(_LIFESTYLE_ITEM)
         return self
     
     def add_followup(self, days: int) -> 'RecommendationBuilder':
-        self.recommendations.append(f"9. 📞 Retorno obrigatório em {days} dias")
+        self._push_template(_FOLLOWUP_TEMPLATE, days)
         return self
     
     def build(self) -> str:
-        return "\n".join(self.recommendations)
+        return "\n".join(
+            text if value is None else text.format(value)
+            for text, value in self._buf[:self._n]
+        )
     
     def get_priority(self) -> str:
         return self.priority
 
 
-class PromptTemplate:
-    """Template para construção de prompts (Pattern Template Method)"""
-    
-    @staticmethod
-    def build_medical_prompt(
-        patient_data: Dict[str, Any], 
-        classification: ClassificationResult
-    ) -> str:
-        """Constrói prompt médico contextualizado"""
-        
-        risk_context = {
-            RiskLevel.CRITICAL: "CASO CRÍTICO - REQUER AÇÃO IMEDIATA",
-            RiskLevel.HIGH: "CASO DE ALTO RISCO - PRIORIDADE ALTA",
-            RiskLevel.MEDIUM: "CASO DE RISCO MÉDIO - ACOMPANHAMENTO NECESSÁRIO",
-            RiskLevel.LOW: "CASO DE BAIXO RISCO - ACOMPANHAMENTO ROTINA"
-        }
-        
-        return f"""
+# Contexto de risco exibido no prompt, por nível de classificação
+_RISK_CONTEXT = {
+    RiskLevel.CRITICAL: "CASO CRÍTICO - REQUER AÇÃO IMEDIATA",
+    RiskLevel.HIGH: "CASO DE ALTO RISCO - PRIORIDADE ALTA",
+    RiskLevel.MEDIUM: "CASO DE RISCO MÉDIO - ACOMPANHAMENTO NECESSÁRIO",
+    RiskLevel.LOW: "CASO DE BAIXO RISCO - ACOMPANHAMENTO ROTINA"
+}
+
+# Dias até o retorno obrigatório, por nível de classificação
+_FOLLOWUP_DAYS_BY_RISK = {
+    RiskLevel.CRITICAL: 3,
+    RiskLevel.HIGH: 7,
+    RiskLevel.MEDIUM: 15,
+    RiskLevel.LOW: 30
+}
+
+# Prioridade da recomendação, por nível de classificação
+_PRIORITY_BY_RISK = {
+    RiskLevel.CRITICAL: "critical",
+    RiskLevel.HIGH: "urgent",
+    RiskLevel.MEDIUM: "high",
+    RiskLevel.LOW: "normal"
+}
+
+# Template do prompt médico; apenas os campos entre chaves variam por paciente
+_MEDICAL_PROMPT_TEMPLATE = """
 Você é um especialista em saúde pública da Secretaria de Saúde do Recife.
 
-**CLASSIFICAÇÃO: {risk_context.get(classification.risk_level, 'NÃO CLASSIFICADO')}**
-**CONFIANÇA: {classification.confidence:.1%}**
+**CLASSIFICAÇÃO: {risk_context}**
+**CONFIANÇA: {confidence:.1%}**
 
 **DADOS DO PACIENTE:**
-- Idade: {patient_data.get('idade')} anos
-- Glicose: {patient_data.get('nivel_glicose')} mg/dL
-- Pressão Arterial: {patient_data.get('pressao_sistolica')}/{patient_data.get('pressao_diastolica')} mmHg
-- Histórico Familiar: {'Sim' if patient_data.get('historico_familiar') else 'Não'}
+- Idade: {idade} anos
+- Glicose: {glicose} mg/dL
+- Pressão Arterial: {sistolica}/{diastolica} mmHg
+- Histórico Familiar: {historico}
 
 **TAREFA:**
 Gere um plano de ação objetivo em tópicos numerados para a equipe de saúde.
@@ -134,6 +182,26 @@ Gere um plano de ação objetivo em tópicos numerados para a equipe de saúde.
 """
 
 
+class PromptTemplate:
+    """Template para construção de prompts (Pattern Template Method)"""
+    
+    @staticmethod
+    def build_medical_prompt(
+        patient_data: Dict[str, Any], 
+        classification: ClassificationResult
+    ) -> str:
+        """Constrói prompt médico contextualizado"""
+        return _MEDICAL_PROMPT_TEMPLATE.format(
+            risk_context=_RISK_CONTEXT.get(classification.risk_level, 'NÃO CLASSIFICADO'),
+            confidence=classification.confidence,
+            idade=patient_data.get('idade'),
+            glicose=patient_data.get('nivel_glicose'),
+            sistolica=patient_data.get('pressao_sistolica'),
+            diastolica=patient_data.get('pressao_diastolica'),
+            historico='Sim' if patient_data.get('historico_familiar') else 'Não'
+        )
+
+
 class LLMService(ILLMService):
     """Serviço para geração de recomendações usando LLM ou fallback local"""
     
@@ -158,14 +226,15 @@ class LLMService(ILLMService):
     ) -> RecommendationData:
         """Gera recomendação personalizada"""
         
-        logger.info(
-            "Gerando recomendação",
-            extra={
-                "risk_level": classification_result.risk_level,
-                "is_outlier": classification_result.is_outlier,
-                "has_llm": bool(self.model)
-            }
-        )
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "Gerando recomendação",
+                extra={
+                    "risk_level": classification_result.risk_level,
+                    "is_outlier": classification_result.is_outlier,
+                    "has_llm": bool(self.model)
+                }
+            )
         
         try:
             if self.model and classification_result.is_outlier:
@@ -181,23 +250,23 @@ class LLMService(ILLMService):
                 priority = self._determine_priority(classification_result.risk_level)
                 generated_by = "local_rules"
             
-            logger.info(f"Recomendação gerada por: {generated_by}")
+            logger.info("Recomendação gerada por: %s", generated_by)
             
-            return RecommendationData(
+            return RecommendationData.model_construct(
                 content=content,
                 priority=priority,
                 generated_by=generated_by,
-                generated_at=datetime.now()
+                generated_at=cached_now()
             )
             
         except Exception as e:
             logger.error(f"Erro na geração de recomendação: {e}")
             # Fallback para recomendação básica
-            return RecommendationData(
+            return RecommendationData.model_construct(
                 content=self._generate_basic_recommendation(),
                 priority="normal",
                 generated_by="fallback",
-                generated_at=datetime.now()
+                generated_at=cached_now()
             )
     
     async def _generate_llm_recommendation(
@@ -210,11 +279,8 @@ class LLMService(ILLMService):
             prompt = PromptTemplate.build_medical_prompt(patient_data, classification)
             
             # Timeout para evitar travamento
-            import asyncio
-            response = await asyncio.wait_for(
-                self.model.generate_content_async(prompt),
-                timeout=30.0
-            )
+            async with asyncio.timeout(30.0):
+                response = await self.model.generate_content_async(prompt)
             
             return response.text.strip()
             
@@ -228,7 +294,7 @@ class LLMService(ILLMService):
         patient_data: Dict[str, Any],
         classification: ClassificationResult
     ) -> str:
-        """Gera recomendação usando regras locais (Pattern Builder)"""
+        """Gera recomendação usando regras locais (memoizada por faixas das entradas)"""
         
         idade = patient_data.get('idade', 0)
         glicose = patient_data.get('nivel_glicose', 0)
@@ -236,6 +302,39 @@ class LLMService(ILLMService):
         diastolica = patient_data.get('pressao_diastolica', 0)
         historico = patient_data.get('historico_familiar', False)
         
+        # O texto gerado depende apenas das faixas abaixo (mesmos limiares do builder)
+        key = (
+            classification.risk_level,
+            classification.is_outlier,
+            2 if glicose > 300 else 1 if glicose > 200 else 0,
+            (
+                2 if sistolica > 180 or diastolica > 110
+                else 1 if sistolica > 160 or diastolica > 100
+                else 0
+            ),
+            2 if idade > 80 else 1 if idade > 65 else 0,
+            bool(historico)
+        )
+        
+        content = _LOCAL_RECOMMENDATION_CACHE.get(key)
+        if content is None:
+            content = self._build_local_recommendation(
+                idade, glicose, sistolica, diastolica, historico, classification
+            )
+            _LOCAL_RECOMMENDATION_CACHE[key] = content
+        return content
+    
+    def _build_local_recommendation(
+        self,
+        idade: int,
+        glicose: float,
+        sistolica: int,
+        diastolica: int,
+        historico: bool,
+        classification: ClassificationResult
+    ) -> str:
+        """Monta recomendação usando regras locais (Pattern Builder)"""
+        
         builder = RecommendationBuilder()
         
         if classification.risk_level == RiskLevel.CRITICAL:
@@ -259,13 +358,7 @@ class LLMService(ILLMService):
         builder.add_family_guidance(historico)
         builder.add_lifestyle_guidance(classification.risk_level)
         
-        followup_days = {
-            RiskLevel.CRITICAL: 3,
-            RiskLevel.HIGH: 7,
-            RiskLevel.MEDIUM: 15,
-            RiskLevel.LOW: 30
-        }
-        builder.add_followup(followup_days.get(classification.risk_level, 15))
+        builder.add_followup(_FOLLOWUP_DAYS_BY_RISK.get(classification.risk_level, 15))
         
         return builder.build()
     
@@ -279,10 +372,4 @@ class LLMService(ILLMService):
     
     def _determine_priority(self, risk_level: Optional[RiskLevel]) -> str:
         """Determina prioridade baseada no nível de risco"""
-        priority_map = {
-            RiskLevel.CRITICAL: "critical",
-            RiskLevel.HIGH: "urgent",
-            RiskLevel.MEDIUM: "high",
-            RiskLevel.LOW: "normal"
-        }
-        return priority_map.get(risk_level, "normal")
\ No newline at end of file
+        return _PRIORITY_BY_RISK.get(risk_level, "normal")
\ No newline at end of file
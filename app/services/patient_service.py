@@ -1,16 +1,21 @@
-from typing import Dict, Any, Optional
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional, Sequence
 from datetime import datetime
 import time
 from app.models.patient import (
     PatientDataInput, 
     PatientData, 
     PatientAnalysisResponse,
+    PatientBatchAnalysisResponse,
     ClassificationResult,
     RecommendationData
 )
 from app.services.classification_service import ClassificationService
 from app.services.llm_service import LLMService
 from app.core.exceptions import ValidationException, ConectaSaudeException
+from app.core.config import settings
+from app.core.context import request_id_var
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
@@ -20,28 +25,35 @@ class PatientAnalysisMetrics:
     """Métricas de análise (preparando para observabilidade)"""
     
     def __init__(self):
-        self.start_time = time.time()
-        self.classification_time: Optional[float] = None
-        self.recommendation_time: Optional[float] = None
-        self.total_time: Optional[float] = None
+        # Relógio monotônico em nanossegundos; cada fase guarda seu próprio delta
+        self._start_ns = time.perf_counter_ns()
+        self._last_mark_ns = self._start_ns
+        self.classification_time_ns: Optional[int] = None
+        self.recommendation_time_ns: Optional[int] = None
+        self.total_time_ns: Optional[int] = None
+    
+    def _elapsed_since_last_mark(self) -> int:
+        now_ns = time.perf_counter_ns()
+        elapsed_ns = now_ns - self._last_mark_ns
+        self._last_mark_ns = now_ns
+        return elapsed_ns
     
     def mark_classification_complete(self):
-        self.classification_time = time.time() - self.start_time
+        self.classification_time_ns = self._elapsed_since_last_mark()
     
     def mark_recommendation_complete(self):
-        if self.classification_time:
-            self.recommendation_time = time.time() - self.start_time - self.classification_time
+        self.recommendation_time_ns = self._elapsed_since_last_mark()
     
     def mark_complete(self):
-        self.total_time = time.time() - self.start_time
+        self.total_time_ns = time.perf_counter_ns() - self._start_ns
     
     def get_total_time_ms(self) -> int:
-        return int((self.total_time or 0) * 1000)
+        return (self.total_time_ns or 0) // 1_000_000
     
     def to_dict(self) -> Dict[str, Any]:
         return {
-            "classification_time_ms": int((self.classification_time or 0) * 1000),
-            "recommendation_time_ms": int((self.recommendation_time or 0) * 1000),
+            "classification_time_ms": (self.classification_time_ns or 0) // 1_000_000,
+            "recommendation_time_ms": (self.recommendation_time_ns or 0) // 1_000_000,
             "total_time_ms": self.get_total_time_ms()
         }
 
@@ -64,26 +76,34 @@ class PatientService:
         metrics = PatientAnalysisMetrics()
         
         # Converter para entidade de domínio
-        patient_data = PatientData(**patient_input.dict())
+        patient_data = PatientData.from_validated_input(patient_input)
         
-        logger.info(
-            "Iniciando análise do paciente",
-            extra={
-                "patient_id": patient_data.id,
-                "patient_age": patient_data.idade,
-                "glucose_level": patient_data.nivel_glicose,
-                "blood_pressure": patient_data.blood_pressure_formatted
-            }
-        )
+        # Dict com os dados clínicos, materializado uma única vez para os serviços
+        patient_dict = patient_data.to_ml_dict()
+        
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "Iniciando análise do paciente",
+                extra={
+                    "patient_id": patient_data.id,
+                    "patient_age": patient_data.idade,
+                    "glucose_level": patient_data.nivel_glicose,
+                    "blood_pressure": patient_data.blood_pressure_formatted
+                }
+            )
         
         try:
+            # As etapas são sequenciais por dependência de dados: a recomendação
+            # consome o resultado da classificação e não há outra E/S independente
+            # a sobrepor (paralelismo entre pacientes fica no processamento em lote).
+            
             # 1. Classificação
-            classification_result = await self._classify_patient(patient_data)
+            classification_result = await self._classify_patient(patient_data, patient_dict)
             metrics.mark_classification_complete()
             
             # 2. Geração de recomendação (se necessário)
             recommendation_data = await self._generate_recommendation(
-                patient_data, classification_result
+                patient_data, patient_dict, classification_result
             )
             metrics.mark_recommendation_complete()
             
@@ -93,23 +113,24 @@ class PatientService:
             metrics.mark_complete()
             
             # 4. Construção da resposta
-            response = PatientAnalysisResponse(
+            response = PatientAnalysisResponse.model_construct(
                 patient_data=patient_input,
                 classification=classification_result,
                 recommendation=recommendation_data,
                 processing_time_ms=metrics.get_total_time_ms()
             )
             
-            logger.info(
-                "Análise concluída com sucesso",
-                extra={
-                    "patient_id": patient_data.id,
-                    "is_outlier": classification_result.is_outlier,
-                    "risk_level": classification_result.risk_level,
-                    "has_recommendation": recommendation_data is not None,
-                    **metrics.to_dict()
-                }
-            )
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    "Análise concluída com sucesso",
+                    extra={
+                        "patient_id": patient_data.id,
+                        "is_outlier": classification_result.is_outlier,
+                        "risk_level": classification_result.risk_level,
+                        "has_recommendation": recommendation_data is not None,
+                        **metrics.to_dict()
+                    }
+                )
             
             return response
             
@@ -130,21 +151,129 @@ class PatientService:
                 details={"original_error": str(e)}
             )
     
-    async def _classify_patient(self, patient_data: PatientData) -> ClassificationResult:
-        """Classifica o paciente usando o serviço de classificação"""
+    async def analyze_batch(
+        self, patient_inputs: Sequence[PatientDataInput]
+    ) -> PatientBatchAnalysisResponse:
+        """
+        Analisa um lote de pacientes - Caso de uso de triagem em massa
+        
+        Classifica o lote inteiro de uma vez e gera recomendações apenas para os
+        outliers, com chamadas simultâneas ao LLM limitadas por um semáforo.
+        A ordem dos resultados é a mesma dos pacientes recebidos.
+        """
+        
+        metrics = PatientAnalysisMetrics()
+        patient_dicts = [patient_input.to_ml_dict() for patient_input in patient_inputs]
+        
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "Iniciando análise em lote",
+                extra={"batch_size": len(patient_dicts)}
+            )
+        
         try:
-            patient_dict = patient_data.dict(exclude={"id", "created_at"})
-            classification_result = await self.classification_service.classify(patient_dict)
+            # 1. Classificação do lote inteiro
+            classifications = await self.classification_service.classify_many(patient_dicts)
+            metrics.mark_classification_complete()
             
-            logger.info(
-                "Classificação concluída",
+            # 2. Recomendações apenas para outliers, com concorrência limitada
+            outlier_indexes = [
+                index for index, classification in enumerate(classifications)
+                if classification.is_outlier
+            ]
+            semaphore = asyncio.Semaphore(settings.BATCH_LLM_CONCURRENCY)
+            
+            async def recommend(index: int) -> RecommendationData:
+                async with semaphore:
+                    return await self.llm_service.generate_recommendation(
+                        patient_dicts[index], classifications[index]
+                    )
+            
+            generated = await asyncio.gather(
+                *(recommend(index) for index in outlier_indexes),
+                return_exceptions=True
+            )
+            
+            recommendations: List[Optional[RecommendationData]] = [None] * len(patient_dicts)
+            for index, recommendation in zip(outlier_indexes, generated):
+                if isinstance(recommendation, BaseException):
+                    logger.error(
+                        "Erro na geração de recomendação do lote",
+                        extra={"batch_index": index, "error": str(recommendation)}
+                    )
+                    recommendation = self._fallback_recommendation()
+                recommendations[index] = recommendation
+            metrics.mark_recommendation_complete()
+            
+            metrics.mark_complete()
+            
+            # 3. Construção da resposta
+            response = PatientBatchAnalysisResponse.model_construct(
+                results=[
+                    PatientAnalysisResponse.model_construct(
+                        patient_data=patient_input,
+                        classification=classification,
+                        recommendation=recommendation
+                    )
+                    for patient_input, classification, recommendation in zip(
+                        patient_inputs, classifications, recommendations
+                    )
+                ],
+                total_patients=len(patient_dicts),
+                outlier_count=len(outlier_indexes),
+                processing_time_ms=metrics.get_total_time_ms()
+            )
+            
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    "Análise em lote concluída com sucesso",
+                    extra={
+                        "request_id": request_id_var.get() or None,
+                        "batch_id": response.batch_id,
+                        "batch_size": len(patient_dicts),
+                        "outlier_count": len(outlier_indexes),
+                        **metrics.to_dict()
+                    }
+                )
+            
+            return response
+            
+        except ConectaSaudeException:
+            # Re-raise business exceptions
+            raise
+        except Exception as e:
+            logger.error(
+                "Erro inesperado na análise em lote",
                 extra={
-                    "patient_id": patient_data.id,
-                    "is_outlier": classification_result.is_outlier,
-                    "confidence": classification_result.confidence,
-                    "risk_level": classification_result.risk_level
+                    "batch_size": len(patient_dicts),
+                    "error": str(e),
+                    "error_type": type(e).__name__
                 }
             )
+            raise ConectaSaudeException(
+                "Falha crítica na análise em lote",
+                details={"original_error": str(e)}
+            )
+    
+    async def _classify_patient(
+        self,
+        patient_data: PatientData,
+        patient_dict: Dict[str, Any]
+    ) -> ClassificationResult:
+        """Classifica o paciente usando o serviço de classificação"""
+        try:
+            classification_result = await self.classification_service.classify(patient_dict)
+            
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    "Classificação concluída",
+                    extra={
+                        "patient_id": patient_data.id,
+                        "is_outlier": classification_result.is_outlier,
+                        "confidence": classification_result.confidence,
+                        "risk_level": classification_result.risk_level
+                    }
+                )
             
             return classification_result
             
@@ -155,41 +284,44 @@ class PatientService:
     async def _generate_recommendation(
         self, 
         patient_data: PatientData, 
+        patient_dict: Dict[str, Any],
         classification_result: ClassificationResult
     ) -> Optional[RecommendationData]:
         """Gera recomendação se necessário"""
         
         # Só gera recomendação para outliers ou casos de risco
         if not classification_result.is_outlier:
-            logger.info(
-                "Paciente dentro dos parâmetros normais, sem recomendação especial",
-                extra={"patient_id": patient_data.id}
-            )
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    "Paciente dentro dos parâmetros normais, sem recomendação especial",
+                    extra={"patient_id": patient_data.id}
+                )
             return None
         
         try:
-            logger.info(
-                "Gerando recomendação para paciente outlier",
-                extra={
-                    "patient_id": patient_data.id,
-                    "risk_level": classification_result.risk_level
-                }
-            )
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    "Gerando recomendação para paciente outlier",
+                    extra={
+                        "patient_id": patient_data.id,
+                        "risk_level": classification_result.risk_level
+                    }
+                )
             
-            patient_dict = patient_data.dict(exclude={"id", "created_at"})
             recommendation_data = await self.llm_service.generate_recommendation(
                 patient_dict, classification_result
             )
             
-            logger.info(
-                "Recomendação gerada com sucesso",
-                extra={
-                    "patient_id": patient_data.id,
-                    "recommendation_length": len(recommendation_data.content),
-                    "priority": recommendation_data.priority,
-                    "generated_by": recommendation_data.generated_by
-                }
-            )
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    "Recomendação gerada com sucesso",
+                    extra={
+                        "patient_id": patient_data.id,
+                        "recommendation_length": len(recommendation_data.content),
+                        "priority": recommendation_data.priority,
+                        "generated_by": recommendation_data.generated_by
+                    }
+                )
             
             return recommendation_data
             
@@ -202,11 +334,16 @@ class PatientService:
                 }
             )
             # Em caso de erro, retorna recomendação básica
-            return RecommendationData(
-                content="Agendar consulta médica para avaliação detalhada",
-                priority="normal",
-                generated_by="fallback"
-            )
+            return self._fallback_recommendation()
+    
+    @staticmethod
+    def _fallback_recommendation() -> RecommendationData:
+        """Recomendação básica usada quando a geração falha"""
+        return RecommendationData.model_construct(
+            content="Agendar consulta médica para avaliação detalhada",
+            priority="normal",
+            generated_by="fallback"
+        )
     
     async def get_health_status(self) -> Dict[str, Any]:
         """Verifica saúde dos serviços dependentes"""
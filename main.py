@@ -1,33 +1,61 @@
 from fastapi import FastAPI, Request, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response
 from fastapi.exceptions import RequestValidationError
+from starlette.datastructures import URL, Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from contextlib import asynccontextmanager
+from functools import lru_cache
 from typing import Dict, Any
+import logging
+import os
+from os import urandom
+import sys
 import time
-import uuid
+import orjson
 import uvicorn
 
 from app.routers import patient_router, health_router
 from app.core.config import settings
-from app.core.logging import setup_logging, get_logger
+from app.core.clock import iso_now
+from app.core.context import request_id_var
+from app.core.logging import setup_logging, flush_logging, get_logger
 from app.core.exceptions import ConectaSaudeException
+from app.services.classification_service import close_http_client
 
 # Global logger
 logger = None
 
+# Logs do middleware de requisições, resolvidos uma única vez no startup (lifespan).
+# O log de entrada só é emitido em modo debug; o de saída sempre que INFO estiver ativo.
+_LOG_REQ_START = False
+_LOG_REQ_END = False
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Gerencia ciclo de vida da aplicação"""
-    global logger
-    setup_logging(settings.LOG_LEVEL)
+    global logger, _LOG_REQ_START, _LOG_REQ_END
+    # Em modo debug os logs são escritos imediatamente, sem buffer
+    setup_logging(
+        settings.LOG_LEVEL,
+        buffer_capacity=0 if settings.DEBUG else settings.LOG_BUFFER_CAPACITY
+    )
     logger = get_logger(__name__)
+    _LOG_REQ_END = logger.isEnabledFor(logging.INFO)
+    _LOG_REQ_START = settings.DEBUG and _LOG_REQ_END
     
     logger.info(f"Iniciando {settings.APP_NAME} v{settings.APP_VERSION}")
+    health_router.start_metrics_sampler()
+    
+    # Schema OpenAPI gerado e serializado antes da primeira requisição
+    _openapi_bytes()
     
     yield
     
+    await health_router.stop_metrics_sampler()
+    await close_http_client()
     logger.info("Encerrando aplicação")
+    flush_logging()
 
 # Criar aplicação FastAPI com Swagger otimizado
 app = FastAPI(
@@ -37,6 +65,7 @@ app = FastAPI(
     docs_url=settings.DOCS_URL,
     redoc_url=settings.REDOC_URL,
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     openapi_tags=[
         {
             "name": "root",
@@ -72,61 +101,116 @@ app = FastAPI(
     ]
 )
 
-# Middleware de logging
-@app.middleware("http")
-async def request_logging_middleware(request: Request, call_next):
-    """Middleware para logging de requisições"""
-    request_id = str(uuid.uuid4())
-    start_time = time.time()
-    
-    request.state.request_id = request_id
-    
-    if logger:
-        logger.info(
-            "Requisição recebida",
-            extra={
-                "request_id": request_id,
-                "method": request.method,
-                "url": str(request.url),
-                "user_agent": request.headers.get("user-agent"),
-                "client_ip": request.client.host if request.client else None
-            }
-        )
+# Middleware de logging (ASGI puro: sem call_next nem BaseHTTPMiddleware)
+class RequestLoggingMiddleware:
+    """Middleware para logging de requisições, request ID e tempo de processamento"""
     
-    response = await call_next(request)
+    __slots__ = ("app",)
     
-    process_time = time.time() - start_time
+    def __init__(self, app: ASGIApp):
+        self.app = app
     
-    if logger:
-        logger.info(
-            "Requisição processada",
-            extra={
-                "request_id": request_id,
-                "status_code": response.status_code,
-                "process_time_ms": int(process_time * 1000)
-            }
-        )
-    
-    response.headers["X-Request-ID"] = request_id
-    response.headers["X-Process-Time"] = f"{process_time:.3f}s"
-    
-    return response
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        # Reaproveita o ID enviado pelo proxy/cliente, se houver
+        request_id_raw = next(
+            (value for name, value in scope["headers"] if name == b"x-request-id"),
+            None
+        ) or urandom(16).hex().encode("latin-1")
+        request_id = request_id_raw.decode("latin-1")
+        start_ns = time.perf_counter_ns()
+        
+        request_id_var.set(request_id)
+        # Também visível como request.state.request_id
+        scope.setdefault("state", {})["request_id"] = request_id
+        
+        # Extras só são montados quando o log correspondente está habilitado
+        if _LOG_REQ_START:
+            # Cliente lido direto do escopo ASGI (tupla host/porta), sem criar o Address
+            client = scope.get("client")
+            logger.info(
+                "Requisição recebida",
+                extra={
+                    "request_id": request_id,
+                    "method": scope["method"],
+                    "url": str(URL(scope=scope)),
+                    "user_agent": Headers(scope=scope).get("user-agent"),
+                    "client_ip": client[0] if client else None
+                }
+            )
+        
+        status_code = None
+        
+        async def send_with_headers(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                process_time_us = (time.perf_counter_ns() - start_ns) // 1_000
+                # Headers anexados direto na lista de tuplas (bytes, bytes) da resposta
+                message["headers"] = [
+                    *message.get("headers", ()),
+                    (b"x-request-id", request_id_raw),
+                    (b"x-process-time", b"%dus" % process_time_us)
+                ]
+            await send(message)
+        
+        await self.app(scope, receive, send_with_headers)
+        
+        if _LOG_REQ_END:
+            logger.info(
+                "Requisição processada",
+                extra={
+                    "request_id": request_id,
+                    "status_code": status_code,
+                    "process_time_ms": (time.perf_counter_ns() - start_ns) // 1_000_000
+                }
+            )
+
+app.add_middleware(RequestLoggingMiddleware)
+
+# Configurar CORS (settings.cors_origins já é uma tupla calculada uma única vez)
+_CORS_ALLOW_METHODS = ("GET", "POST", "PUT", "DELETE")
+# Lista explícita: o preflight valida por pertinência em vez de ecoar os headers pedidos
+_CORS_ALLOW_HEADERS = ("content-type", "authorization", "accept", "x-request-id")
+_CORS_EXPOSE_HEADERS = ("X-Request-ID", "X-Process-Time")
 
-# Configurar CORS
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.cors_origins,
     allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE"],
-    allow_headers=["*"],
-    expose_headers=["X-Request-ID", "X-Process-Time"]
+    allow_methods=_CORS_ALLOW_METHODS,
+    allow_headers=_CORS_ALLOW_HEADERS,
+    expose_headers=_CORS_EXPOSE_HEADERS
 )
 
 # Exception handlers
+def _error_response(
+    status_code: int,
+    error: str,
+    message: str,
+    request_id: str,
+    details: Any = None
+) -> Response:
+    """Resposta de erro serializada direto com orjson (campo details só quando informado)"""
+    content = {"error": error, "message": message}
+    if details is not None:
+        content["details"] = details
+    content["request_id"] = request_id
+    # default=str: o "ctx" dos erros de validação pode conter a exceção original
+    # (ex.: ValueError de um model_validator), que o orjson não serializa nativamente
+    return Response(
+        content=orjson.dumps(content, default=str),
+        status_code=status_code,
+        media_type="application/json"
+    )
+
 @app.exception_handler(ConectaSaudeException)
 async def conecta_saude_exception_handler(request: Request, exc: ConectaSaudeException):
     """Handler para exceções de negócio"""
-    request_id = getattr(request.state, 'request_id', str(uuid.uuid4()))
+    request_id = request_id_var.get() or urandom(16).hex()
     
     if logger:
         logger.error(
@@ -134,49 +218,47 @@ async def conecta_saude_exception_handler(request: Request, exc: ConectaSaudeExc
             extra={
                 "request_id": request_id,
                 "error_code": exc.error_code,
-                "message": exc.message,
+                "error_message": exc.message,
                 "details": exc.details
             }
         )
     
-    return JSONResponse(
-        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-        content={
-            "error": exc.error_code,
-            "message": exc.message,
-            "details": exc.details,
-            "request_id": request_id
-        }
+    return _error_response(
+        status.HTTP_422_UNPROCESSABLE_ENTITY,
+        exc.error_code,
+        exc.message,
+        request_id,
+        details=exc.details
     )
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     """Handler para erros de validação do Pydantic"""
-    request_id = getattr(request.state, 'request_id', str(uuid.uuid4()))
+    request_id = request_id_var.get() or urandom(16).hex()
+    errors = exc.errors()
     
     if logger:
         logger.warning(
             "Erro de validação de entrada",
             extra={
                 "request_id": request_id,
-                "validation_errors": exc.errors()
+                "validation_errors": errors
             }
         )
     
-    return JSONResponse(
-        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-        content={
-            "error": "VALIDATION_ERROR",
-            "message": "Dados de entrada inválidos",
-            "details": exc.errors(),
-            "request_id": request_id
-        }
+    return _error_response(
+        status.HTTP_422_UNPROCESSABLE_ENTITY,
+        "VALIDATION_ERROR",
+        "Dados de entrada inválidos",
+        request_id,
+        details=errors
     )
 
 @app.exception_handler(Exception)
 async def general_exception_handler(request: Request, exc: Exception):
     """Handler para exceções não tratadas"""
-    request_id = getattr(request.state, 'request_id', str(uuid.uuid4()))
+    request_id = request_id_var.get() or urandom(16).hex()
+    error_message = str(exc)
     
     if logger:
         logger.error(
@@ -184,24 +266,51 @@ async def general_exception_handler(request: Request, exc: Exception):
             extra={
                 "request_id": request_id,
                 "error_type": type(exc).__name__,
-                "error_message": str(exc)
+                "error_message": error_message
             },
-            exc_info=True
+            # Traceback formatado apenas em modo debug
+            exc_info=settings.DEBUG and logger.isEnabledFor(logging.ERROR)
         )
     
-    return JSONResponse(
-        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        content={
-            "error": "INTERNAL_SERVER_ERROR",
-            "message": str(exc),  # Sempre mostrar erro detalhado (modo desenvolvimento)
-            "request_id": request_id
-        }
+    return _error_response(
+        status.HTTP_500_INTERNAL_SERVER_ERROR,
+        "INTERNAL_SERVER_ERROR",
+        error_message,  # Sempre mostrar erro detalhado (modo desenvolvimento)
+        request_id
     )
 
 # Incluir routers
 app.include_router(health_router.router)
 app.include_router(patient_router.router)
 
+# Partes fixas das respostas de / e /hello, montadas uma única vez na importação
+_HELLO_STATIC: Dict[str, Any] = {
+    "message": "Hello World! 🌍",
+    "service": settings.APP_NAME,
+    "version": settings.APP_VERSION,
+    "status": "success ✅"
+}
+
+_ROOT_BYTES = orjson.dumps({
+    "service": settings.APP_NAME,
+    "version": settings.APP_VERSION,
+    "environment": settings.ENVIRONMENT,
+    "status": "online ✅",
+    "description": settings.APP_DESCRIPTION,
+    "endpoints": {
+        "hello": "/hello - Hello World simples",
+        "health": "/health - Health checks",
+        "patients": f"{settings.API_V1_PREFIX}/patient - Análise de pacientes",
+        "docs": f"{settings.DOCS_URL} - Documentação interativa" if settings.DOCS_URL else "Desabilitado em produção"
+    },
+    "features": {
+        "classification": "Classificação ML de outliers",
+        "recommendations": "Geração de recomendações com IA",
+        "monitoring": "Health checks e métricas",
+        "logging": "Logging estruturado"
+    }
+})
+
 # Endpoint Hello World
 @app.get(
     "/hello",
@@ -221,53 +330,48 @@ app.include_router(patient_router.router)
                 }
             }
         }
-    }
+    },
+    response_class=ORJSONResponse
 )
-async def hello_world() -> Dict[str, Any]:
+async def hello_world() -> ORJSONResponse:
     """
     Endpoint simples Hello World
     
     Retorna uma mensagem de boas-vindas com informações básicas do serviço.
     Útil para testar a conectividade básica da API.
     """
-    from datetime import datetime
-    
-    return {
-        "message": "Hello World! 🌍",
-        "timestamp": datetime.now().isoformat() + "Z",
-        "service": settings.APP_NAME,
-        "version": settings.APP_VERSION,
-        "status": "success ✅"
-    }
+    return ORJSONResponse({
+        **_HELLO_STATIC,
+        "timestamp": iso_now()
+    })
 
 # Endpoint raiz
 @app.get(
     "/",
     summary="Informações da API",
     description="Endpoint raiz com informações gerais da API",
-    tags=["root"]
+    tags=["root"],
+    response_class=ORJSONResponse
 )
-async def root() -> Dict[str, Any]:
+async def root() -> Response:
     """Endpoint raiz com informações da API"""
-    return {
-        "service": settings.APP_NAME,
-        "version": settings.APP_VERSION,
-        "environment": settings.ENVIRONMENT,
-        "status": "online ✅",
-        "description": settings.APP_DESCRIPTION,
-        "endpoints": {
-            "hello": "/hello - Hello World simples",
-            "health": "/health - Health checks",
-            "patients": f"{settings.API_V1_PREFIX}/patient - Análise de pacientes",
-            "docs": f"{settings.DOCS_URL} - Documentação interativa" if settings.DOCS_URL else "Desabilitado em produção"
-        },
-        "features": {
-            "classification": "Classificação ML de outliers",
-            "recommendations": "Geração de recomendações com IA",
-            "monitoring": "Health checks e métricas",
-            "logging": "Logging estruturado"
-        }
-    }
+    return Response(content=_ROOT_BYTES, media_type="application/json")
+
+# OpenAPI: substitui a rota padrão por uma que serve o schema já serializado
+@lru_cache(maxsize=1)
+def _openapi_bytes() -> bytes:
+    """Schema OpenAPI serializado uma única vez (todas as rotas já estão registradas)"""
+    return orjson.dumps(app.openapi())
+
+app.router.routes = [
+    route for route in app.router.routes
+    if getattr(route, "path", None) != app.openapi_url
+]
+
+@app.get(app.openapi_url, include_in_schema=False)
+async def openapi_json() -> Response:
+    """Schema OpenAPI (usado pelo Swagger UI e ReDoc)"""
+    return Response(content=_openapi_bytes(), media_type="application/json")
 
 if __name__ == "__main__":
     if logger:
@@ -280,11 +384,19 @@ if __name__ == "__main__":
             }
         )
     
+    # Reload exige um único processo; fora do modo debug usa a regra 2n+1.
+    # O lifespan roda em cada worker (sampler de métricas e cliente HTTP por processo).
+    workers = 1 if settings.DEBUG else (os.cpu_count() or 1) * 2 + 1
+    
     uvicorn.run(
         "main:app",
         host=settings.HOST,
         port=settings.PORT,
         reload=settings.DEBUG,
+        workers=workers,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",  # uvloop não suporta Windows
+        http="httptools",
         log_level=settings.LOG_LEVEL.lower(),
-        access_log=True  # Sempre mostrar logs de acesso (modo desenvolvimento)
+        # Fora do modo debug o RequestLoggingMiddleware já registra cada requisição
+        access_log=settings.DEBUG
     )
\ No newline at end of file
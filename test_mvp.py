@@ -1,18 +1,42 @@
 """
 Teste simples para MVP
 """
-import requests
+import http.client
+import orjson
 import sys
 
+HOST = "localhost"
+PORT = 8082
+
+# Timeout (segundos) para não travar se a API não responder
+TIMEOUT = 2.0
+
+# Conexão única (keep-alive) compartilhada por todos os testes
+conn = http.client.HTTPConnection(HOST, PORT, timeout=TIMEOUT)
+
+
+def get(path: str):
+    """GET na API; retorna (status, corpo em bytes)"""
+    try:
+        conn.request("GET", path)
+        response = conn.getresponse()
+        # O corpo precisa ser lido por inteiro antes de reutilizar a conexão
+        return response.status, response.read()
+    except Exception:
+        # Fecha para a próxima chamada reconectar em vez de falhar com "Request-sent"
+        conn.close()
+        raise
+
 
 def test_health_endpoint():
     """Testa endpoint de health"""
     try:
-        response = requests.get("http://localhost:8082/health")
-        print(f"✅ Health Check: {response.status_code}")
-        if response.json():
-            print(f"✅ Response: {response.json()['status']}")
-        return response.status_code == 200
+        status, body = get("/health/")
+        print(f"✅ Health Check: {status}")
+        data = orjson.loads(body)
+        if data:
+            print(f"✅ Response: {data['status']}")
+        return status == 200
     except Exception as e:
         print(f"❌ Health Check Failed: {e}")
         return False
@@ -21,11 +45,12 @@ def test_health_endpoint():
 def test_hello_endpoint():
     """Testa endpoint hello world"""
     try:
-        response = requests.get("http://localhost:8082/hello")
-        print(f"✅ Hello Endpoint: {response.status_code}")
-        if response.json():
-            print(f"✅ Message: {response.json()['message']}")
-        return response.status_code == 200
+        status, body = get("/hello")
+        print(f"✅ Hello Endpoint: {status}")
+        data = orjson.loads(body)
+        if data:
+            print(f"✅ Message: {data['message']}")
+        return status == 200
     except Exception as e:
         print(f"❌ Hello Endpoint Failed: {e}")
         return False
@@ -34,11 +59,12 @@ def test_hello_endpoint():
 def test_root_endpoint():
     """Testa endpoint raiz"""
     try:
-        response = requests.get("http://localhost:8082/")
-        print(f"✅ Root Endpoint: {response.status_code}")
-        if response.json():
-            print(f"✅ Service: {response.json()['service']}")
-        return response.status_code == 200
+        status, body = get("/")
+        print(f"✅ Root Endpoint: {status}")
+        data = orjson.loads(body)
+        if data:
+            print(f"✅ Service: {data['service']}")
+        return status == 200
     except Exception as e:
         print(f"❌ Root Endpoint Failed: {e}")
         return False
@@ -47,9 +73,9 @@ def test_root_endpoint():
 def test_swagger_docs():
     """Testa documentação Swagger"""
     try:
-        response = requests.get("http://localhost:8082/docs")
-        print(f"✅ Swagger Docs: {response.status_code}")
-        return response.status_code == 200
+        status, _ = get("/docs")
+        print(f"✅ Swagger Docs: {status}")
+        return status == 200
     except Exception as e:
         print(f"❌ Swagger Docs Failed: {e}")
         return False
@@ -57,27 +83,30 @@ def test_swagger_docs():
 
 if __name__ == "__main__":
     print("🧪 Executando testes básicos da API MVP\n")
-    
+
     tests = [
         test_health_endpoint,
         test_hello_endpoint,
         test_root_endpoint,
         test_swagger_docs
     ]
-    
+
     passed = 0
     total = len(tests)
-    
-    for test in tests:
-        if test():
-            passed += 1
-        print()
-    
+
+    try:
+        for test in tests:
+            if test():
+                passed += 1
+            print()
+    finally:
+        conn.close()
+
     print(f"📊 Resultado: {passed}/{total} testes passaram")
-    
+
     if passed == total:
         print("🎉 Todos os testes passaram! API MVP funcionando.")
         sys.exit(0)
     else:
         print("⚠️  Alguns testes falharam. Verifique se a API está rodando.")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)